@@ -1,6 +1,13 @@
-import json
+import asyncio
+import logging
+import mmap
 import os
-from typing import Dict, Any, List
+import pickle
+import sys
+import orjson
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from .base_agent import AgentResult
 from .intent_agent import IntentAgent
 from .product_agent import ProductAgent
 from .troubleshooting_agent import TroubleshootingAgent
@@ -8,13 +15,65 @@ from .transaction_agent import TransactionAgent
 from .response_agent import ResponseAgent
 from .tools import PartSelectTools
 
+logger = logging.getLogger(__name__)
+
+# overridable with PARTS_DATA_DIR, relative to backend/ by default
+DEFAULT_PARTS_DATA_DIR = "../data"
+PARTS_CATALOG_FILES = ("refrigerator_parts.json", "dishwasher_parts.json")
+
+# all catalogs merged, rebuild with build_parts_bundle.py after editing them
+PARTS_BUNDLE_FILE = "parts_bundle.json"
+
+# pickle sidecar written next to each parts json
+PARTS_CACHE_SUFFIX = ".cache.pkl"
+
+# low-cardinality fields repeated across many parts, unique ids like partselect_number gain nothing
+INTERNED_PART_FIELDS = ("category", "appliance_type", "brand", "subcategory")
+
+RESPONSE_CACHE_SIZE = 512
+
+TRANSACTION_INTENTS = frozenset({"purchase_intent", "add_to_cart", "cart_management"})
+
+# canned replies, callers get a shallow copy and parts is a tuple so it can't be mutated in place
+OUT_OF_SCOPE_RESPONSE = {
+    "message": "I can only help with refrigerator and dishwasher parts.",
+    "parts": (),
+    "query_type": "out_of_scope"
+}
+ERROR_RESPONSE = {
+    "message": "Sorry, I encountered an error. Please try again.",
+    "parts": (),
+    "query_type": "error"
+}
+
 class AgentOrchestrator:
     """basically direct tool access"""
 
     def __init__(self):
         self.tools = None
         self.parts_data = []
+
+        # agents get direct tool access (no registration needed) and are built on first use
+        self._agent_factories = {
+            "intent": IntentAgent,
+            "product": lambda: ProductAgent(self.tools),
+            "troubleshooting": lambda: TroubleshootingAgent(self.tools),
+            "transaction": TransactionAgent,
+            "response": ResponseAgent,
+        }
+        self.agents = {}  # name -> agent, filled by _get_agent
         self.cart = {"items": [], "total_items": 0, "subtotal": 0.0}
+        self._response_cache = OrderedDict()  # normalized query -> response data, LRU order
+
+        # intent -> specialist route, anything not listed goes to the product agent
+        self.intent_routes = {
+            "part_lookup": self._route_product,
+            "product_search": self._route_product,
+            "compatibility_check": self._route_product,
+            "installation_help": self._route_product,
+            "troubleshooting": self._route_troubleshooting,
+        }
+        self.intent_routes.update(dict.fromkeys(TRANSACTION_INTENTS, self._route_transaction))
 
     async def initialize(self):
 
@@ -24,13 +83,6 @@ class AgentOrchestrator:
         # Initialize tools
         self.tools = PartSelectTools(self.parts_data)
 
-        # Initialize agents with direct tool access (no registration needed)
-        self.intent_agent = IntentAgent()
-        self.product_agent = ProductAgent(self.tools)
-        self.troubleshooting_agent = TroubleshootingAgent(self.tools)
-        self.transaction_agent = TransactionAgent()
-        self.response_agent = ResponseAgent()
-
         # Initialize vector search if available
         vector_initialized = await self.tools.initialize_vector_search()
 
@@ -38,84 +90,218 @@ class AgentOrchestrator:
         
         try:
             self.parts_data = []
+            data_dir = os.getenv("PARTS_DATA_DIR", DEFAULT_PARTS_DATA_DIR)
 
-            # Load refrigerator parts
-            refrigerator_paths = [
-                "../data/refrigerator_parts.json"
-            ]
-
-            for path in refrigerator_paths:
-                if os.path.exists(path):
-                    with open(path, 'r') as f:
-                        data = json.load(f)
-                        self.parts_data.extend(data.get('parts', []))
-                    break
+            bundle_path = os.path.join(data_dir, PARTS_BUNDLE_FILE)
+            catalog_paths = [os.path.join(data_dir, name) for name in PARTS_CATALOG_FILES]
 
-            # Load dishwasher parts
-            dishwasher_paths = [
-                "../data/dishwasher_parts.json"
-            ]
+            # prebuilt bundle from build_parts_bundle.py, one stat + one parse, as long as no catalog changed since
+            parts = None
+            if self._bundle_is_stale(bundle_path, catalog_paths):
+                logger.warning("%s is older than the parts catalogs, loading the catalogs instead "
+                               "(rerun build_parts_bundle.py)", bundle_path)
+            else:
+                try:
+                    parts = await self._load_catalog(bundle_path)
+                except Exception as e:
+                    # the bundle is only a hand built shortcut, a broken one (empty, truncated, bad json)
+                    # shouldn't cost us the catalogs it was built from
+                    logger.warning("couldn't load %s, loading the catalogs instead: %s", bundle_path, e)
 
-            for path in dishwasher_paths:
-                if os.path.exists(path):
-                    with open(path, 'r') as f:
-                        data = json.load(f)
-                        self.parts_data.extend(data.get('parts', []))
-                    break
+            if parts is None:
+                # no usable bundle, parse every catalog in worker threads at the same time
+                catalogs = await asyncio.gather(*(self._load_catalog(path) for path in catalog_paths))
+                parts = [part for catalog in catalogs if catalog for part in catalog]
 
+            self.parts_data = parts
 
         except Exception as e:
             self.parts_data = []
 
+    @staticmethod
+    def _bundle_is_stale(bundle_path: str, catalog_paths: List[str]) -> bool:
+        # the bundle is gitignored and only rebuilt by hand, so a re-scraped or edited catalog can be newer
+        try:
+            bundle_mtime = os.stat(bundle_path).st_mtime_ns
+        except OSError:
+            return False
+        for path in catalog_paths:
+            try:
+                if os.stat(path).st_mtime_ns > bundle_mtime:
+                    return True
+            except OSError:
+                continue
+        return False
+
+    @staticmethod
+    def _intern_part_fields(parts: List[Dict]):
+        # a handful of distinct values repeated across every part, share one string each
+        for part in parts:
+            for field in INTERNED_PART_FIELDS:
+                value = part.get(field)
+                if isinstance(value, str):
+                    part[field] = sys.intern(value)
+
+    async def _load_catalog(self, path: str) -> Optional[List[Dict]]:
+        # a missing file is normal (no bundle built, appliance not scraped), anything else isn't
+        try:
+            return await asyncio.to_thread(self._read_parts_file, path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_parts_file(path: str) -> List[Dict]:
+        """parts list from a catalog json, reusing the pickle sidecar while it's fresh"""
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cache_path = path + PARTS_CACHE_SUFFIX
+
+        # sidecar = pickled (mtime, size) header followed by the pickled parts list
+        try:
+            with open(cache_path, 'rb') as f:
+                if pickle.load(f) == stamp:
+                    parts = pickle.load(f)
+                    if isinstance(parts, list):
+                        AgentOrchestrator._intern_part_fields(parts)
+                        return parts
+        except Exception:
+            # the sidecar is only a cache, whatever is wrong with it (missing, truncated, junk body,
+            # pickled by a newer python) the json below is the source of truth
+            pass
+
+        # parse straight out of the page cache, no intermediate bytes copy of the whole file
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                parts = orjson.loads(view).get('parts', [])
+
+        # interned here on the worker thread rather than on the event loop after the load
+        AgentOrchestrator._intern_part_fields(parts)
+
+        # write to a temp file + rename so a crash never leaves a half written cache
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(stamp, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(parts, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # the cache is best effort, a failed cleanup shouldn't fail the load
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+        return parts
+
     async def process_query(self, query: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
         try:
+            # repeat questions with no conversation context get the cached answer
+            cache_key = query.strip().lower() if not conversation_history else None
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                return cached
 
-            # classify intent 
-            intent_result = await self.intent_agent.process(query)
-
-            # out of scope ?
-            if intent_result.data.get("intent") == "out_of_scope":
-                return {
-                    "message": "I can only help with refrigerator and dishwasher parts.",
-                    "parts": [],
-                    "query_type": "out_of_scope"
-                }
-            intent = intent_result.data.get("intent", "general_info")
-            entities = intent_result.data.get("extracted_entities", {})
-
-            # route to appropriate agent
-            context = {"intent": intent, "extracted_entities": entities, "conversation_history": conversation_history}
-
-            if intent in ["part_lookup", "product_search", "compatibility_check", "installation_help"]:
-                specialist_result = await self.product_agent.process(query, context)
-            elif intent == "troubleshooting":
-                specialist_result = await self.troubleshooting_agent.process(query, context)
-            elif intent in ["purchase_intent", "add_to_cart", "cart_management"]:
-                # First get part details from product agent, then process transaction
-                product_result = await self.product_agent.process(query, context)
-                if product_result and product_result.success:
-                    # Pass product agent results to transaction agent
-                    context["specialist_result"] = product_result.data
-                    context["cart"] = self.cart
-                    specialist_result = await self.transaction_agent.process(query, context)
-                else:
-                    # If product agent fails, use its result directly
-                    specialist_result = product_result
-            else:
-                specialist_result = await self.product_agent.process(query, context)
+            intent, context = await self._run_specialist(query, conversation_history)
+            if context is None:
+                return dict(OUT_OF_SCOPE_RESPONSE)
 
             # Step 3: Generate response
-            context["specialist_result"] = specialist_result.data if specialist_result else {}
-            final_result = await self.response_agent.process(query, context)
+            final_result = await self._get_agent("response").process(query, context)
+            self._cache_response(cache_key, intent, final_result)
 
             return final_result.data
 
         except Exception as e:
-            return {
-                "message": "Sorry, I encountered an error. Please try again.",
-                "parts": [],
-                "query_type": "error"
-            }
+            return dict(ERROR_RESPONSE)
+
+    async def process_query_stream(self, query: str, conversation_history: List[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """same pipeline as process_query, but yields ("delta", text) while the response is written
+        and always ends with ("result", data) holding what process_query would have returned"""
+        try:
+            cache_key = query.strip().lower() if not conversation_history else None
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                yield "result", cached
+                return
+
+            intent, context = await self._run_specialist(query, conversation_history)
+            if context is None:
+                yield "result", dict(OUT_OF_SCOPE_RESPONSE)
+                return
+
+            response_agent = self._get_agent("response")
+            chunks = []
+            async for chunk in response_agent.stream(query, context):
+                chunks.append(chunk)
+                yield "delta", chunk
+
+            # parts filtering needs the whole text, so the final result only exists once streaming is done
+            final_result = response_agent.build_result(context, "".join(chunks))
+            self._cache_response(cache_key, intent, final_result)
+
+            yield "result", final_result.data
+
+        except Exception as e:
+            yield "result", dict(ERROR_RESPONSE)
+
+    def _cached_response(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        cached = self._response_cache.get(cache_key) if cache_key else None
+        if cached is None:
+            return None
+        self._response_cache.move_to_end(cache_key)
+        return dict(cached)
+
+    def _cache_response(self, cache_key: Optional[str], intent: str, final_result: AgentResult):
+        # cart flows aren't cached, their answers aren't a function of the query alone. neither is a
+        # template that only stands in for a failed llm call, the next ask should try the llm again
+        if (cache_key and final_result.success and intent not in TRANSACTION_INTENTS
+                and not final_result.data.get("llm_fallback")):
+            self._response_cache[cache_key] = final_result.data
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+    async def _run_specialist(self, query: str, conversation_history: List[Dict]):
+        """intent + specialist steps, returns (intent, context for the response agent). context is None when out of scope"""
+        # classify intent 
+        intent_result = await self._get_agent("intent").process(query)
+
+        # out of scope ?
+        if intent_result.data.get("intent") == "out_of_scope":
+            return "out_of_scope", None
+        intent = intent_result.data.get("intent", "general_info")
+        entities = intent_result.data.get("extracted_entities", {})
+
+        # route to appropriate agent
+        context = {"intent": intent, "extracted_entities": entities, "conversation_history": conversation_history}
+
+        route = self.intent_routes.get(intent, self._route_product)
+        specialist_result = await route(query, context)
+
+        context["specialist_result"] = specialist_result.data if specialist_result else {}
+        return intent, context
+
+    def _get_agent(self, name: str):
+        agent = self.agents.get(name)
+        if agent is None:
+            agent = self.agents[name] = self._agent_factories[name]()
+        return agent
+
+    async def _route_product(self, query: str, context: Dict[str, Any]) -> AgentResult:
+        return await self._get_agent("product").process(query, context)
+
+    async def _route_troubleshooting(self, query: str, context: Dict[str, Any]) -> AgentResult:
+        return await self._get_agent("troubleshooting").process(query, context)
+
+    async def _route_transaction(self, query: str, context: Dict[str, Any]) -> AgentResult:
+        # First get part details from product agent, then process transaction
+        product_result = await self._get_agent("product").process(query, context)
+        if product_result and product_result.success:
+            # Pass product agent results to transaction agent
+            context["specialist_result"] = product_result.data
+            context["cart"] = self.cart
+            return await self._get_agent("transaction").process(query, context)
+        # If product agent fails, use its result directly
+        return product_result
 
     async def process_transaction(self, transaction_data: Dict) -> Dict[str, Any]:
         try:
@@ -130,9 +316,15 @@ class AgentOrchestrator:
         self.cart = {"items": [], "total_items": 0, "subtotal": 0.0}
         return {"success": True}
 
+    async def close(self):
+        # only the response agent holds a connection pool, and only if it was ever built
+        response_agent = self.agents.get("response")
+        if response_agent:
+            await response_agent.aclose()
+
     def get_agent_status(self) -> Dict[str, Any]:
         return {
-            "agents": ["intent", "product", "troubleshooting", "transaction", "response"],
+            "agents": list(self._agent_factories),
             "tools_available": self.tools is not None,
             "parts_loaded": len(self.parts_data)
         }
\ No newline at end of file
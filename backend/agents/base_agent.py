@@ -1,6 +1,5 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
-import json
 
 class BaseAgent(ABC):
     """base class for all agents hehe"""
@@ -8,35 +7,34 @@ class BaseAgent(ABC):
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
-        self.tools = {}
+        self.tools = {}  # tool name -> async callable
+        self.tool_descriptions = {}
 
     @abstractmethod
     async def process(self, query: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         pass
 
     def register_tool(self, name: str, func, description: str):
-        self.tools[name] = {
-            "function": func,
-            "description": description
-        }
+        self.tools[name] = func
+        self.tool_descriptions[name] = description
 
     async def call_tool(self, tool_name: str, **kwargs) -> Any:
-        if tool_name not in self.tools:
+        tool = self.tools.get(tool_name)
+        if tool is None:
             raise ValueError(f"Tool {tool_name} not available for agent {self.name}")
 
-        try:
-            tool = self.tools[tool_name]
-            return await tool["function"](**kwargs)
-        except Exception as e:
-            return {"error": f"Tool execution failed: {str(e)}"}
+        # tool errors propagate (cancellation too), the agent's process() turns them into a failed result
+        return await tool(**kwargs)
 
     def get_available_tools(self) -> List[str]:
         return list(self.tools.keys())
 
     def get_tool_descriptions(self) -> Dict[str, str]:
-        return {name: tool["description"] for name, tool in self.tools.items()}
+        return dict(self.tool_descriptions)
 
 class AgentResult:
+    # created for every agent hop, slots keep it small and skip the per-instance __dict__
+    __slots__ = ("success", "data", "message", "next_agent", "tools_used")
 
     def __init__(self, success: bool, data: Any = None, message: str = "",
                  next_agent: str = None, tools_used: List[str] = None):
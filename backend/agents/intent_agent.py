@@ -1,152 +1,253 @@
 # Intent Classification Agent, pretty much determines what the user wants to do based on their query
 
+import math
 import re
+from collections import OrderedDict
 from typing import Dict, Any, List
 from .base_agent import BaseAgent, AgentResult
 
+APPLIANCE_WORDS = ["refrigerator", "fridge", "dishwasher", "appliance"]
+PART_WORDS = ["part", "filter", "ice maker", "door", "seal", "pump", "motor", "valve", "rack"]
+# part numbers are PS/W + digits plus anything else with a 2-3 letter prefix. two findall passes, not one
+# alternation: with letters glued on front ("forps11752778") the generic match swallows the prefix and
+# only the separate PS/W pass still finds the number that actually resolves.
+# the number patterns only ever see the lowercased query, so lowercase classes and no IGNORECASE
+PREFIXED_PART_NUMBER_PATTERN = re.compile(r'(?:ps|w)\s?\d{8,}')
+PART_NUMBER_PATTERN = re.compile(r'[a-z]{2,3}\s?\d{6,}')
+MODEL_NUMBER_PATTERN = re.compile(r'[a-z]{2,4}\d{3,}[a-z]*\d*')
+SCOPE_PART_NUMBER_PATTERN = re.compile(r'[a-z]{2}\d{6,}')
+BRANDS = ["whirlpool", "kenmore", "ge", "frigidaire", "lg", "samsung", "kitchenaid", "bosch"]
+# "want to buy/purchase/order" used to be listed too, but they can't match without the single words matching first
+PURCHASE_KEYWORDS = ("buy", "purchase", "order", "add to cart")
+PART_NUMBER_CONFIDENCE = 0.8
+INTENT_CACHE_SIZE = 1024
+INTENT_CACHE_MAX_QUERY_LENGTH = 256  # longer pastes are rarely repeated, not worth holding as keys
+
+CATEGORIES = [
+    "water filter", "ice maker", "door seal", "door shelf", "drawer",
+    "wash arm", "pump", "rack", "control board", "motor", "valve"
+]
+
+REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+WHITESPACE_RUN = r"\s+"
+
+def _literal_keyword(pattern: str):
+    # "not\s+working" is really just "not working" once the query's whitespace is collapsed,
+    # those get a plain substring check. None for anything that needs the regex engine
+    keyword = pattern.replace(WHITESPACE_RUN, " ")
+    return keyword if REGEX_METACHARACTERS.isdisjoint(keyword) else None
+
+def _keyword_pattern(keywords: List[str], whole_words: List[str] = ()):
+    # zero width lookahead so finditer reports every keyword occurrence, overlapping ones too,
+    # which is what a bunch of separate `keyword in text` checks would have found.
+    # whole_words only count with word boundaries on both sides, "ge" inside "fridge" doesn't
+    alternatives = [r"\b" + re.escape(word) + r"\b" for word in whole_words]
+    alternatives += [re.escape(keyword) for keyword in keywords]
+    return re.compile("(?=(" + "|".join(alternatives) + "))")
+
+# all lowercase, these only ever run against the lowercased query so no IGNORECASE needed
+INTENT_PATTERNS = {
+    "part_lookup": [
+        r"part\s+number\s+([a-z]{2}\s?\d+)",
+        r"([a-z]{2}\s?\d+)",
+        r"what\s+is\s+([a-z]{2}\s?\d+)",
+        r"tell\s+me\s+about\s+([a-z]{2}\s?\d+)",
+        r"details\s+for\s+([a-z]{2}\s?\d+)"
+    ],
+    "compatibility_check": [
+        r"compatible\s+with",
+        r"fit\s+my\s+(\w+)",
+        r"work\s+with\s+model",
+        r"model\s+([a-z0-9]+)",
+        r"will.*work.*(\w+)",
+        r"does.*fit"
+    ],
+    "installation_help": [
+        r"how\s+to\s+install",
+        r"install.*part",
+        r"installation\s+guide",
+        r"how\s+do\s+i\s+install",
+        r"replace.*part",
+        r"repair.*guide",
+        r"fix.*install"
+    ],
+    "troubleshooting": [
+        r"not\s+working",
+        r"broken",
+        r"fix.*problem",
+        r"repair",
+        r"troubleshoot",
+        r"issue\s+with",
+        r"problem\s+with",
+        r"won't\s+work",
+        r"not\s+functioning",
+        r"making\s+noise",
+        r"leaking",
+        r"common.*problems?",
+        r"what.*problems?",
+        r"what.*issues?",
+        r"problems?\s+with",
+        r"issues?\s+with",
+        r"what.*wrong",
+        r"what.*can.*go.*wrong",
+        r"typical.*problems?",
+        r"frequent.*problems?",
+        r"usual.*problems?"
+    ],
+    "product_search": [
+        r"need.*filter",
+        r"looking\s+for",
+        r"find.*part",
+        r"search\s+for",
+        r"show\s+me",
+        r"water\s+filter",
+        r"ice\s+maker",
+        r"door\s+seal",
+        r"parts\s+for",
+        r"add.*ice.*part",
+        r"add.*icemaker"
+    ],
+    "purchase_intent": [
+        r"buy",
+        r"order",
+        r"purchase",
+        r"add\s+to\s+cart",
+        r"want\s+to\s+buy",
+        r"want\s+to\s+order",
+        r"want\s+to\s+purchase"
+    ],
+    "purchase_confirmation": [
+        r"^yes$",
+        r"^y$",
+        r"^ok$",
+        r"^okay$",
+        r"proceed",
+        r"go\s+ahead",
+        r"confirm",
+        r"add\s+it",
+        r"add\s+to\s+cart"
+    ],
+    "pricing_inquiry": [
+        r"price",
+        r"cost",
+        r"how\s+much",
+        r"pricing",
+        r"total"
+    ],
+    "cart_operations": [
+        r"cart",
+        r"checkout",
+        r"view\s+cart",
+        r"shopping\s+cart",
+        r"add.*cart",
+        r"add\s+it",
+        r"yes.*add",
+        r"proceed.*add"
+    ],
+    "ordering_info": [
+        r"in\s+stock",
+        r"availability",
+        r"shipping",
+        r"delivery"
+    ],
+    "general_info": [
+        r"what\s+is",
+        r"tell\s+me\s+about",
+        r"information\s+about",
+        r"details\s+about"
+    ]
+}
+
+def _intent_matchers():
+    # compiled once per process instead of per agent or through re's cache on every query. each
+    # entry is (intent, screen, keywords, matchers, weight): the screen is one alternation of all
+    # the intent's patterns so intents with no hit are ruled out in a single scan. hits are then
+    # counted with substring checks for the plain keyword patterns (most of them) and bound
+    # .search methods for the real regexes
+    intent_matchers = []
+    for intent, patterns in INTENT_PATTERNS.items():
+        keywords = []
+        matchers = []
+        for pattern in patterns:
+            keyword = _literal_keyword(pattern)
+            if keyword is not None:
+                keywords.append(keyword)
+            else:
+                matchers.append(re.compile(pattern).search)
+
+        intent_matchers.append((
+            intent,
+            re.compile("|".join(f"(?:{pattern})" for pattern in patterns)).search,
+            tuple(keywords),
+            matchers,
+            INTENT_SCORE_SCALE // len(patterns)
+        ))
+    return intent_matchers
+
+# scores are hits / pattern count. every count divides INTENT_SCORE_SCALE, so hits * weight is that
+# same ratio as an exact int and picking the winner needs no float division at all
+INTENT_SCORE_SCALE = math.lcm(*(len(patterns) for patterns in INTENT_PATTERNS.values()))
+INTENT_MATCHERS = _intent_matchers()
+
+# one shared reasoning string per intent instead of formatting a fresh one per classification
+INTENT_REASONINGS = {
+    intent: f"Classified as {intent} based on patterns and entities" for intent in INTENT_PATTERNS
+}
+
+# scope only needs to know if any appliance/part word shows up at all
+SCOPE_KEYWORD_PATTERN = re.compile("|".join(re.escape(word) for word in APPLIANCE_WORDS + PART_WORDS))
+ENTITY_KEYWORD_PATTERN = _keyword_pattern(["refrigerator", "fridge", "dishwasher"] + CATEGORIES, BRANDS)
+
 class IntentAgent(BaseAgent):
     def __init__(self):
         super().__init__(
             name="intent_classifier",
             description="Classifies user intent from natural language queries"
         )
-        self.intent_patterns = self._load_intent_patterns()
+        self.intent_patterns = INTENT_PATTERNS
+        self._result_cache = OrderedDict()  # normalized query -> (data, message, next_agent), LRU order
 
-    def _load_intent_patterns(self) -> Dict[str, List[str]]:
-        return {
-            "part_lookup": [
-                r"part\s+number\s+([A-Z]{2}\s?\d+)",
-                r"([A-Z]{2}\s?\d+)",
-                r"what\s+is\s+([A-Z]{2}\s?\d+)",
-                r"tell\s+me\s+about\s+([A-Z]{2}\s?\d+)",
-                r"details\s+for\s+([A-Z]{2}\s?\d+)"
-            ],
-            "compatibility_check": [
-                r"compatible\s+with",
-                r"fit\s+my\s+(\w+)",
-                r"work\s+with\s+model",
-                r"model\s+([A-Z0-9]+)",
-                r"will.*work.*(\w+)",
-                r"does.*fit"
-            ],
-            "installation_help": [
-                r"how\s+to\s+install",
-                r"install.*part",
-                r"installation\s+guide",
-                r"how\s+do\s+i\s+install",
-                r"replace.*part",
-                r"repair.*guide",
-                r"fix.*install"
-            ],
-            "troubleshooting": [
-                r"not\s+working",
-                r"broken",
-                r"fix.*problem",
-                r"repair",
-                r"troubleshoot",
-                r"issue\s+with",
-                r"problem\s+with",
-                r"won't\s+work",
-                r"not\s+functioning",
-                r"making\s+noise",
-                r"leaking",
-                r"common.*problems?",
-                r"what.*problems?",
-                r"what.*issues?",
-                r"problems?\s+with",
-                r"issues?\s+with",
-                r"what.*wrong",
-                r"what.*can.*go.*wrong",
-                r"typical.*problems?",
-                r"frequent.*problems?",
-                r"usual.*problems?"
-            ],
-            "product_search": [
-                r"need.*filter",
-                r"looking\s+for",
-                r"find.*part",
-                r"search\s+for",
-                r"show\s+me",
-                r"water\s+filter",
-                r"ice\s+maker",
-                r"door\s+seal",
-                r"parts\s+for",
-                r"add.*ice.*part",
-                r"add.*icemaker"
-            ],
-            "purchase_intent": [
-                r"buy",
-                r"order",
-                r"purchase",
-                r"add\s+to\s+cart",
-                r"want\s+to\s+buy",
-                r"want\s+to\s+order",
-                r"want\s+to\s+purchase"
-            ],
-            "purchase_confirmation": [
-                r"^yes$",
-                r"^y$",
-                r"^ok$",
-                r"^okay$",
-                r"proceed",
-                r"go\s+ahead",
-                r"confirm",
-                r"add\s+it",
-                r"add\s+to\s+cart"
-            ],
-            "pricing_inquiry": [
-                r"price",
-                r"cost",
-                r"how\s+much",
-                r"pricing",
-                r"total"
-            ],
-            "cart_operations": [
-                r"cart",
-                r"checkout",
-                r"view\s+cart",
-                r"shopping\s+cart",
-                r"add.*cart",
-                r"add\s+it",
-                r"yes.*add",
-                r"proceed.*add"
-            ],
-            "ordering_info": [
-                r"in\s+stock",
-                r"availability",
-                r"shipping",
-                r"delivery"
-            ],
-            "general_info": [
-                r"what\s+is",
-                r"tell\s+me\s+about",
-                r"information\s+about",
-                r"details\s+about"
-            ]
-        }
-
-    def _is_in_scope(self, query: str) -> bool:
-        query_lower = query.lower()
-
-        # check for appliance keywords
-        appliance_words = ["refrigerator", "fridge", "dishwasher", "appliance"]
-        has_appliance = any(word in query_lower for word in appliance_words)
-
-        # check for part numbers
-        has_part_number = bool(re.search(r'[A-Z]{2}\d{6,}', query, re.IGNORECASE))
-
-        # check for appliance parts keywords
-        part_words = ["part", "filter", "ice maker", "door", "seal", "pump", "motor", "valve", "rack"]
-        has_parts = any(word in query_lower for word in part_words)
-
-        return has_appliance or has_part_number or has_parts
+    def _is_in_scope(self, query_lower: str) -> bool:
+        # check for appliance or appliance parts keywords, one scan for both lists
+        if SCOPE_KEYWORD_PATTERN.search(query_lower):
+            return True
+
+        # check for part numbers, only reached when no keyword hit
+        return bool(SCOPE_PART_NUMBER_PATTERN.search(query_lower))
 
     async def process(self, query: str, context: Dict[str, Any] = None) -> AgentResult:
-        try:
-            query_lower = query.lower().strip()
+        query_lower = query.lower().strip()
 
+        # classification only depends on the normalized query, retries and "yes"/"cart" repeat a lot
+        cached = self._result_cache.get(query_lower)
+        if cached is not None:
+            self._result_cache.move_to_end(query_lower)
+            data, message, next_agent = cached
+            return AgentResult(success=True, data=self._copy_data(data), message=message, next_agent=next_agent)
+
+        result = self._classify(query_lower)
+        if result.success and len(query_lower) <= INTENT_CACHE_MAX_QUERY_LENGTH:
+            self._result_cache[query_lower] = (result.data, result.message, result.next_agent)
+            if len(self._result_cache) > INTENT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+            result = AgentResult(success=True, data=self._copy_data(result.data), message=result.message,
+                                 next_agent=result.next_agent)
+        return result
+
+    @staticmethod
+    def _copy_data(data: Dict[str, Any]) -> Dict[str, Any]:
+        # callers get their own entity lists/scores so nothing they do can leak into the cache,
+        # everything else in there is an immutable str/float
+        copy = dict(data)
+        copy["extracted_entities"] = {key: list(values) for key, values in data["extracted_entities"].items()}
+        if "intent_scores" in data:
+            copy["intent_scores"] = dict(data["intent_scores"])
+        return copy
+
+    def _classify(self, query_lower: str) -> AgentResult:
+        try:
             # simple scope check
-            if not self._is_in_scope(query):
+            if not self._is_in_scope(query_lower):
                 return AgentResult(
                     success=True,
                     data={
@@ -161,53 +262,49 @@ class IntentAgent(BaseAgent):
             # get entities like part numbers, model numbers n stuff
             entities = self._extract_entities(query_lower)
 
+            part_numbers = entities.get("part_numbers")
+
+            # a part number decides the route by itself, so pattern scoring gets skipped for it.
+            # purchase wording is the one case that still needs scores to pick purchase vs cart
+            if part_numbers:
+                if "install" in query_lower or "how to" in query_lower:
+                    return self._classified("installation_help", PART_NUMBER_CONFIDENCE, entities, {})
+                if "compatible" in query_lower or "fit" in query_lower:
+                    return self._classified("compatibility_check", PART_NUMBER_CONFIDENCE, entities, {})
+                if not any(keyword in query_lower for keyword in PURCHASE_KEYWORDS):
+                    return self._classified("part_lookup", PART_NUMBER_CONFIDENCE, entities, {})
+
+            # raw hit counts per intent, weighted_scores holds the same thing scaled by the weights
             intent_scores = {}
+            weighted_scores = {}
 
-            for intent, patterns in self.intent_patterns.items():
-                score = 0.0
-                matched_patterns = []
+            # \s+ in the keyword patterns matches any whitespace run, single spaces make that a plain `in`
+            query_spaced = " ".join(query_lower.split())
 
-                for pattern in patterns:
-                    if re.search(pattern, query_lower, re.IGNORECASE):
-                        score += 1.0
-                        matched_patterns.append(pattern)
+            for intent, screen, keywords, matchers, weight in INTENT_MATCHERS:
+                if not screen(query_lower):
+                    continue
 
-                if score > 0:
-                    intent_scores[intent] = score / len(patterns)
+                hits = sum(1 for keyword in keywords if keyword in query_spaced)
+                hits += sum(1 for match in matchers if match(query_lower))
+                intent_scores[intent] = hits
+                weighted_scores[intent] = hits * weight
 
             if not intent_scores:
                 primary_intent = "general_info"
                 confidence = 0.5
             else:
-                primary_intent = max(intent_scores, key=intent_scores.get)
-                confidence = intent_scores[primary_intent]
+                primary_intent = max(weighted_scores, key=weighted_scores.get)
+                # only the winner gets turned into a ratio
+                confidence = weighted_scores[primary_intent] / INTENT_SCORE_SCALE
 
-           
-            if entities.get("part_numbers"):
-                if "install" in query_lower or "how to" in query_lower:
-                    primary_intent = "installation_help"
-                elif "compatible" in query_lower or "fit" in query_lower:
-                    primary_intent = "compatibility_check"
-                elif any(keyword in query_lower for keyword in ["buy", "purchase", "order", "want to buy", "want to purchase", "want to order", "add to cart"]):
-                    # Keep purchase intent if purchase keywords are present
-                    if primary_intent not in ["purchase_intent", "cart_operations"]:
-                        primary_intent = "purchase_intent"
-                else:
-                    primary_intent = "part_lookup"
-                confidence = max(confidence, 0.8)
+            if part_numbers:
+                # Keep purchase intent if purchase keywords are present
+                if primary_intent not in ["purchase_intent", "cart_operations"]:
+                    primary_intent = "purchase_intent"
+                confidence = max(confidence, PART_NUMBER_CONFIDENCE)
 
-            return AgentResult(
-                success=True,
-                data={
-                    "intent": primary_intent,
-                    "confidence": confidence,
-                    "extracted_entities": entities,
-                    "intent_scores": intent_scores,
-                    "reasoning": f"Classified as {primary_intent} based on patterns and entities"
-                },
-                message=f"Intent classified as {primary_intent} with {confidence:.1%} confidence",
-                next_agent="orchestrator"
-            )
+            return self._classified(primary_intent, confidence, entities, intent_scores)
 
         except Exception as e:
             return AgentResult(
@@ -215,62 +312,43 @@ class IntentAgent(BaseAgent):
                 message=f"Intent classification failed: {str(e)}"
             )
 
+    def _classified(self, primary_intent: str, confidence: float, entities: Dict[str, List[str]],
+                    intent_scores: Dict[str, int]) -> AgentResult:
+        return AgentResult(
+            success=True,
+            data={
+                "intent": primary_intent,
+                "confidence": confidence,
+                "extracted_entities": entities,
+                "intent_scores": intent_scores,
+                "reasoning": INTENT_REASONINGS[primary_intent]
+            },
+            message=f"Intent classified as {primary_intent} with {confidence:.1%} confidence",
+            next_agent="orchestrator"
+        )
 
-    def _extract_entities(self, query: str) -> Dict[str, List[str]]:
-        """Extract entities like part numbers, model numbers, etc."""
-        entities = {
-            "part_numbers": [],
-            "model_numbers": [],
-            "brands": [],
-            "appliance_types": [],
-            "categories": []
-        }
-
-        # get em part numbers (PS + digits, W + digits, etc.)
-        part_patterns = [
-            r'PS\s?\d{8,}',
-            r'W\s?\d{8,}',   
-            r'[A-Z]{2,3}\s?\d{6,}',  
-        ]
-
-        for pattern in part_patterns:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            entities["part_numbers"].extend(matches)
-
-        # get model numbers
-        model_patterns = [
-            r'[A-Z]{2,4}\d{3,}[A-Z]*\d*',  
-        ]
-
-        for pattern in model_patterns:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            entities["model_numbers"].extend(matches)
-
-        # gett brands 
-        brands = ["whirlpool", "kenmore", "ge", "frigidaire", "lg", "samsung", "kitchenaid", "bosch"]
-        for brand in brands:
-            # Use word boundaries to avoid "ge" matching inside "fridge"
-            if re.search(r'\b' + brand + r'\b', query.lower()):
-                entities["brands"].append(brand.title())
+
+    def _extract_entities(self, query_lower: str) -> Dict[str, List[str]]:
+        """Extract entities like part numbers, model numbers, etc. from the already lowercased query"""
+        # brand + appliance + category keywords found in one pass
+        found_keywords = {match.group(1) for match in ENTITY_KEYWORD_PATTERN.finditer(query_lower)}
 
         # get appliance types n also normalize fridge as refrigerator lol
-        query_lower = query.lower()
-        if "refrigerator" in query_lower or "fridge" in query_lower:
-            entities["appliance_types"].append("refrigerator")
-        if "dishwasher" in query_lower:
-            entities["appliance_types"].append("dishwasher")
-
-        # get categories
-        categories = [
-            "water filter", "ice maker", "door seal", "door shelf", "drawer",
-            "wash arm", "pump", "rack", "control board", "motor", "valve"
-        ]
-        for category in categories:
-            if category in query.lower():
-                entities["categories"].append(category)
-
-        # kick duplicates
-        for key in entities:
-            entities[key] = list(set(entities[key]))
-
-        return entities
\ No newline at end of file
+        appliance_types = []
+        if "refrigerator" in found_keywords or "fridge" in found_keywords:
+            appliance_types.append("refrigerator")
+        if "dishwasher" in found_keywords:
+            appliance_types.append("dishwasher")
+
+        # only the regex hits can repeat, dict.fromkeys kicks those while keeping first-seen order
+        # so [0] picks are deterministic. the keyword buckets come out of fixed lists, already unique
+        return {
+            # get em part numbers (PS + digits, W + digits, etc.)
+            "part_numbers": list(dict.fromkeys(
+                PREFIXED_PART_NUMBER_PATTERN.findall(query_lower) + PART_NUMBER_PATTERN.findall(query_lower)
+            )),
+            "model_numbers": list(dict.fromkeys(MODEL_NUMBER_PATTERN.findall(query_lower))),
+            "brands": [brand.title() for brand in BRANDS if brand in found_keywords],
+            "appliance_types": appliance_types,
+            "categories": [category for category in CATEGORIES if category in found_keywords]
+        }
\ No newline at end of file
@@ -2,9 +2,13 @@
 # for the product queries like search, installation, and compatibility 
 
 
+import asyncio
 from typing import Dict, Any, List
 from .base_agent import BaseAgent, AgentResult
 
+# most tool calls in flight at once across every request, the fan-out grows with how many part numbers a user pastes
+TOOL_CALL_CONCURRENCY = 8
+
 class ProductAgent(BaseAgent):
 
     def __init__(self, tools=None):
@@ -13,6 +17,13 @@ class ProductAgent(BaseAgent):
             description="Handles product search, installation guidance, and compatibility checking"
         )
         self.tools = tools  # Direct tool access instead of registration
+        self._tool_slots = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+
+        # intent -> handler, anything not listed (part_lookup included) is a part search
+        self.intent_handlers = {
+            "installation_help": self._handle_installation,
+            "compatibility_check": self._handle_compatibility,
+        }
 
     async def process(self, query: str, context: Dict[str, Any] = None) -> AgentResult:
         try:
@@ -20,15 +31,8 @@ class ProductAgent(BaseAgent):
             intent = intent_data.get("intent", "part_lookup")
 
             # Route to appropriate handler based on intent
-            if intent == "part_lookup":
-                return await self._handle_part_search(query, intent_data)
-            elif intent == "installation_help":
-                return await self._handle_installation(query, intent_data)
-            elif intent == "compatibility_check":
-                return await self._handle_compatibility(query, intent_data)
-            else:
-                # Default to part search for unknown intents
-                return await self._handle_part_search(query, intent_data)
+            handler = self.intent_handlers.get(intent, self._handle_part_search)
+            return await handler(query, intent_data)
 
         except Exception as e:
             return AgentResult(
@@ -44,12 +48,8 @@ class ProductAgent(BaseAgent):
         # if there's have specific part numbers, get those directly
         part_numbers = entities.get("part_numbers", [])
         if part_numbers:
-            parts = []
-            for part_number in part_numbers:
-                part_details = await self.tools.get_part_details(part_number) if self.tools else None
-                if part_details and "error" not in part_details:
-                    parts.append(part_details)
-            tools_used.append("get_part_details")
+            parts = await self._lookup_parts(part_numbers)
+            tools_used.append("get_parts_details_bulk")
 
             if parts:
                 return AgentResult(
@@ -68,14 +68,13 @@ class ProductAgent(BaseAgent):
         appliance_types = entities.get("appliance_types", [])
 
         if categories:
+            appliance_type = appliance_types[0] if appliance_types else None
+            results = await self._gather_tool_calls("get_parts_by_category", [
+                {"category": category, "appliance_type": appliance_type, "limit": 10}
+                for category in categories
+            ])
             parts = []
-            for category in categories:
-                appliance_type = appliance_types[0] if appliance_types else None
-                category_parts = await self.tools.get_parts_by_category(
-                    category=category,
-                    appliance_type=appliance_type,
-                    limit=10
-                ) if self.tools else []
+            for category_parts in results:
                 if category_parts and "error" not in category_parts:
                     parts.extend(category_parts)
             tools_used.append("get_parts_by_category")
@@ -126,23 +125,17 @@ class ProductAgent(BaseAgent):
         tools_used = []
 
         if part_numbers:
-            installation_guides = []
-            parts_info = []
-
-            for part_number in part_numbers:
-                # gett installation guide
-                guide = await self.tools.get_installation_guide(part_number) if self.tools else {}
-                tools_used.append("get_installation_guide")
-
-                if guide and "error" not in guide:
-                    installation_guides.append(guide)
+            part_numbers = list(dict.fromkeys(part_numbers))
+            lookups = [{"part_number": part_number} for part_number in part_numbers]
 
-                # get part details for context
-                part_details = await self.tools.get_part_details(part_number) if self.tools else None
-                tools_used.append("get_part_details")
+            # installation guides + part details for context, every part at once
+            guides, parts_info = await asyncio.gather(
+                self._gather_tool_calls("get_installation_guide", lookups),
+                self._lookup_parts(part_numbers)
+            )
+            tools_used.extend(["get_installation_guide", "get_parts_details_bulk"])
 
-                if part_details and "error" not in part_details:
-                    parts_info.append(part_details)
+            installation_guides = [guide for guide in guides if guide and "error" not in guide]
 
             return AgentResult(
                 success=True,
@@ -174,18 +167,22 @@ class ProductAgent(BaseAgent):
 
         # Case 1: Direct compatibility check (part + model provided)
         if part_numbers and model_numbers:
-            for part_number in part_numbers:
-                for model_number in model_numbers:
-                    compatibility_result = await self.tools.check_compatibility(
-                        part_number=part_number,
-                        model_number=model_number
-                    ) if self.tools else {}
-                    tools_used.append("check_compatibility")
-
-                    if "error" not in compatibility_result:
-                        results.append(compatibility_result)
-                    part_details = await self.tools.get_part_details(part_number) if self.tools else None
-                    tools_used.append("get_part_details")
+            part_numbers = list(dict.fromkeys(part_numbers))
+            model_numbers = list(dict.fromkeys(model_numbers))
+            pairs = [
+                {"part_number": part_number, "model_number": model_number}
+                for part_number in part_numbers
+                for model_number in model_numbers
+            ]
+
+            # whole part x model matrix plus each part's details (once per part, not per pair)
+            checks, parts_info = await asyncio.gather(
+                self._gather_tool_calls("check_compatibility", pairs),
+                self._lookup_parts(part_numbers)
+            )
+            tools_used.extend(["check_compatibility", "get_parts_details_bulk"])
+
+            results = [check for check in checks if check and "error" not in check]
 
             return AgentResult(
                 success=True,
@@ -194,7 +191,7 @@ class ProductAgent(BaseAgent):
                     "check_type": "direct_check",
                     "parts_checked": part_numbers,
                     "models_checked": model_numbers,
-                    "parts": [part_details] if part_details and "error" not in part_details else []
+                    "parts": parts_info
                 },
                 tools_used=tools_used,
                 message=f"Checked compatibility for {len(part_numbers)} part(s) with {len(model_numbers)} model(s)"
@@ -202,13 +199,9 @@ class ProductAgent(BaseAgent):
 
         # Case 2: Part number provided, looking for compatible models
         elif part_numbers:
-            parts_info = []
-            for part_number in part_numbers:
-                part_details = await self.tools.get_part_details(part_number) if self.tools else None
-                tools_used.append("get_part_details")
-
-                if part_details and "error" not in part_details:
-                    parts_info.append(part_details)
+            part_numbers = list(dict.fromkeys(part_numbers))
+            parts_info = await self._lookup_parts(part_numbers)
+            tools_used.append("get_parts_details_bulk")
 
             return AgentResult(
                 success=True,
@@ -246,6 +239,24 @@ class ProductAgent(BaseAgent):
                 message="Need both part number and model number for compatibility check"
             )
 
+    async def _gather_tool_calls(self, tool_name: str, calls: List[Dict[str, Any]]) -> List[Any]:
+        """one tool call per kwargs dict, all in flight together, results in call order"""
+        if not self.tools:
+            return [None] * len(calls)
+        tool = getattr(self.tools, tool_name)
+        return await asyncio.gather(*(self._call_tool_limited(tool, kwargs) for kwargs in calls))
+
+    async def _call_tool_limited(self, tool, kwargs: Dict[str, Any]) -> Any:
+        async with self._tool_slots:
+            return await tool(**kwargs)
+
+    async def _lookup_parts(self, part_numbers: List[str]) -> List[Dict[str, Any]]:
+        """catalog parts for the given numbers in one bulk call, unknown numbers dropped"""
+        if not self.tools:
+            return []
+        details = await self.tools.get_parts_details_bulk(part_numbers)
+        return list(details.values())
+
     def _build_search_params(self, query: str, entities: Dict[str, List[str]]) -> Dict[str, Any]:
         params = {
             "query": query
@@ -1,10 +1,38 @@
 # Response Agent, generates natural language responses using Deepseek LLM cuz yk we need it
 
+import asyncio
+import logging
 import os
+import re
+import time
+from collections import OrderedDict, deque
 import httpx
-from typing import Dict, Any, List
+import orjson
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 from .base_agent import BaseAgent, AgentResult
 
+logger = logging.getLogger(__name__)
+
+MENTIONED_PART_PATTERN = re.compile(r'#(PS\d+)')
+DEEPSEEK_TIMEOUT = 30.0
+DEEPSEEK_MAX_KEEPALIVE = 20
+# backup requests are off unless DEEPSEEK_HEDGE_PERCENTILE is set, see _hedge_delay
+DEEPSEEK_HEDGE_LATENCY_SAMPLES = 200
+DEEPSEEK_HEDGE_MIN_SAMPLES = 20
+# below the median most calls would get a second paid request
+DEEPSEEK_HEDGE_MIN_PERCENTILE = 50.0
+LLM_CACHE_SIZE = 512
+# these intents show every part the specialist found, the rest get filtered against the response text
+PASSTHROUGH_INTENTS = frozenset({"part_lookup", "purchase_intent", "installation_help", "compatibility_check"})
+# the llm context only shows the start of a part's model list
+MODEL_PREVIEW_CHARS = 100
+# every model adds at least its ", " separator, so this many always covers the preview
+MODEL_PREVIEW_COUNT = MODEL_PREVIEW_CHARS // 2 + 1
+# intents whose template reply comes from the transaction agent's message or a canned line
+TRANSACTION_TEMPLATE_INTENTS = frozenset({"cart_operations", "purchase_intent", "pricing_inquiry", "checkout_assistance"})
+SSE_DATA_PREFIX = "data: "
+SSE_DONE = "[DONE]"
+
 class ResponseAgent(BaseAgent):
     def __init__(self):
         super().__init__(
@@ -13,31 +41,173 @@ class ResponseAgent(BaseAgent):
         )
         self.deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
         self.deepseek_base_url = "https://api.deepseek.com/v1"
+        self._client = None  # pooled client shared by every LLM call, see _get_client
+        self._llm_cache = OrderedDict()  # user prompt -> generated text, LRU order
+        # e.g. 95: a call still unanswered at the p95 of recent call latencies gets one backup request
+        self._hedge_percentile = self._hedge_percentile_from_env()
+        self._latencies = deque(maxlen=DEEPSEEK_HEDGE_LATENCY_SAMPLES)  # seconds, recent successful calls
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # made on first use so the agent can be built outside a running loop. keeping it around
+        # means calls reuse the open TLS connection instead of a fresh handshake every response
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.deepseek_base_url,
+                headers={
+                    "Authorization": f"Bearer {self.deepseek_api_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=DEEPSEEK_TIMEOUT,
+                limits=httpx.Limits(max_keepalive_connections=DEEPSEEK_MAX_KEEPALIVE)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _hedge_percentile_from_env() -> Optional[float]:
+        # agents are built on the first request, so a bad value has to turn hedging off, not raise there
+        value = os.getenv("DEEPSEEK_HEDGE_PERCENTILE", "").strip()
+        if not value:
+            return None
+        try:
+            percentile = float(value)
+        except ValueError:
+            percentile = None
+        if percentile is None or not DEEPSEEK_HEDGE_MIN_PERCENTILE <= percentile <= 100:
+            logger.warning("DEEPSEEK_HEDGE_PERCENTILE=%r isn't a number from %g to 100, hedging stays off",
+                           value, DEEPSEEK_HEDGE_MIN_PERCENTILE)
+            return None
+        return percentile
+
+    def _hedge_delay(self) -> Optional[float]:
+        # a normal completion takes seconds, so any fixed cutoff below that would just double every call.
+        # only hedge calls that are already slower than the configured percentile of recent ones
+        if self._hedge_percentile is None or len(self._latencies) < DEEPSEEK_HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self._hedge_percentile / 100))]
+
+    async def _post_completion(self, payload: Dict[str, Any]) -> httpx.Response:
+        body = orjson.dumps(payload)
+        hedge_delay = self._hedge_delay()
+        started = time.perf_counter()
+        if hedge_delay is None:
+            response = await self._get_client().post("/chat/completions", content=body)
+        else:
+            response = await self._post_hedged(body, hedge_delay)
+        if response.status_code == 200:
+            # what the caller waited, a hedged call counts from the first send
+            self._latencies.append(time.perf_counter() - started)
+        return response
+
+    async def _post_hedged(self, body: bytes, hedge_delay: float) -> httpx.Response:
+        # backup request for deepseek's slow spells: if the first post hasn't come back after
+        # hedge_delay, send the same one again and keep whichever answers first.
+        # only ever one hedge so the worst case is double the calls, not a pile of them.
+        # the loser is cancelled here but deepseek may still finish (and bill) it
+        client = self._get_client()
+        pending = {asyncio.ensure_future(client.post("/chat/completions", content=body))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                pending.add(asyncio.ensure_future(client.post("/chat/completions", content=body)))
+            while not done or (pending and all(task.exception() for task in done)):
+                # a failed request doesn't win the race while the other one is still going
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.exception():
+                    return task.result()
+            return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _cached_llm_response(self, prompt: str):
+        cached = self._llm_cache.get(prompt)
+        if cached is not None:
+            self._llm_cache.move_to_end(prompt)
+        return cached
+
+    def _cache_llm_response(self, prompt: str, text: str):
+        self._llm_cache[prompt] = text
+        if len(self._llm_cache) > LLM_CACHE_SIZE:
+            self._llm_cache.popitem(last=False)
+
+    def _llm_enabled(self) -> bool:
+        return bool(self.deepseek_api_key and self.deepseek_api_key != "demo_key")
+
+    @staticmethod
+    def _unpack_context(context: Dict[str, Any]) -> Tuple[Dict, Dict, List]:
+        intent_data = context.get("intent", "unknown")
+        if isinstance(intent_data, str):
+            intent_data = {"intent": intent_data}
+        specialist_result = context.get("specialist_result", {})
+        # some specialists hand back a single "part", fold it into "parts" here once so nothing downstream re-checks
+        if not specialist_result.get("parts") and "part" in specialist_result:
+            specialist_result = {**specialist_result, "parts": [specialist_result["part"]]}
+        return intent_data, specialist_result, context.get("conversation_history", [])
 
     async def process(self, query: str, context: Dict[str, Any] = None) -> AgentResult:
         try:
-            intent_data = context.get("intent", "unknown")
-            if isinstance(intent_data, str):
-                intent_data = {"intent": intent_data}
-            specialist_result = context.get("specialist_result", {})
-            conversation_history = context.get("conversation_history", [])
+            intent_data, specialist_result, conversation_history = self._unpack_context(context)
 
-
-            if self.deepseek_api_key and self.deepseek_api_key != "demo_key":
+            if self._llm_enabled():
                 response_text = await self._generate_deepseek_response(
                     query, intent_data, specialist_result, conversation_history
                 )
+                if response_text is None:
+                    # deepseek failed, answer from the template but mark it so nobody caches it
+                    context["llm_fallback"] = True
+                    response_text = self._generate_template_response(query, intent_data, specialist_result)
             else:
                 response_text = self._generate_template_response(
                     query, intent_data, specialist_result
                 )
 
+            return self.build_result(context, response_text)
+
+        except Exception as e:
+            return AgentResult(
+                success=False,
+                message=f"Response generation failed: {str(e)}"
+            )
+
+    async def stream(self, query: str, context: Dict[str, Any]) -> AsyncIterator[str]:
+        """the response text in chunks as the llm writes it, build_result on the joined text gives what process() would"""
+        intent_data, specialist_result, conversation_history = self._unpack_context(context)
+
+        if not self._llm_enabled():
+            yield self._generate_template_response(query, intent_data, specialist_result)
+            return
+
+        streamed = False
+        try:
+            async for chunk in self._stream_deepseek_response(query, intent_data, specialist_result):
+                streamed = True
+                yield chunk
+        except Exception:
+            # same template fallback as process(), unless half an answer already went out
+            if streamed:
+                raise
+            context["llm_fallback"] = True
+            yield self._generate_template_response(query, intent_data, specialist_result)
+
+    def build_result(self, context: Dict[str, Any], response_text: str) -> AgentResult:
+        try:
+            intent_data, specialist_result, _ = self._unpack_context(context)
+
             parts = specialist_result.get("parts", [])
-            if not parts and "part" in specialist_result:
-                parts = [specialist_result["part"]]
 
             # filter parts based on intent - for search queries, limit to top relevant results
-            filtered_parts = self._filter_parts_for_response(parts, intent_data.get("intent"), response_text)
+            intent = intent_data.get("intent")
+            if intent in PASSTHROUGH_INTENTS:
+                filtered_parts = parts
+            else:
+                filtered_parts = self._filter_parts_for_response(parts, intent, response_text)
 
             return AgentResult(
                 success=True,
@@ -47,7 +217,9 @@ class ResponseAgent(BaseAgent):
                     "query_type": intent_data.get("intent", "general"),
                     "confidence": specialist_result.get("confidence", 0.5),
                     "agent_trace": ["scope", "intent", "product", "response"],
-                    "tools_used": specialist_result.get("tools_used", [])
+                    "tools_used": specialist_result.get("tools_used", []),
+                    # template stand-in for a failed llm call, set by process()/stream()
+                    "llm_fallback": context.get("llm_fallback", False)
                 },
                 message="Response generated successfully"
             )
@@ -58,13 +230,11 @@ class ResponseAgent(BaseAgent):
                 message=f"Response generation failed: {str(e)}"
             )
 
-    async def _generate_deepseek_response(self, query: str, intent_data: Dict,
-                                        specialist_result: Dict, conversation_history: List) -> str:
-        try:
-            # Build context for the LLM
-            context = self._build_llm_context(intent_data, specialist_result)
+    def _deepseek_payload(self, query: str, intent_data: Dict, specialist_result: Dict) -> Dict[str, Any]:
+        # Build context for the LLM
+        context = self._build_llm_context(intent_data, specialist_result)
 
-            system_prompt = """You are a helpful PartSelect customer service agent specializing in refrigerator and dishwasher parts.
+        system_prompt = """You are a helpful PartSelect customer service agent specializing in refrigerator and dishwasher parts.
 
                             CRITICAL GUIDELINES:
                             - ONLY use information provided in the Context section
@@ -77,41 +247,79 @@ class ResponseAgent(BaseAgent):
 
                             IMPORTANT: If context shows no parts or empty results, do NOT invent part details. Instead, apologize and ask the customer to verify the part number or provide model information."""
 
-            user_prompt = f"""
+        user_prompt = f"""
                             User Query: {query}
                             Intent: {intent_data.get('intent', 'unknown')}
                             Context: {context}
 
                             Please provide a helpful response about the parts query."""
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.deepseek_base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.deepseek_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        "max_tokens": 400,
-                        "temperature": 0.7
-                    },
-                    timeout=30.0
-                )
+        return {
+            "model": "deepseek-chat",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": 400,
+            "temperature": 0.7
+        }
 
-                if response.status_code == 200:
-                    result = response.json()
-                    generated_response = result["choices"][0]["message"]["content"]
-                    return generated_response
-                else:
-                    return self._generate_template_response(query, intent_data, specialist_result)
+    async def _generate_deepseek_response(self, query: str, intent_data: Dict,
+                                        specialist_result: Dict, conversation_history: List) -> Optional[str]:
+        """deepseek's answer, None if the call failed"""
+        try:
+            payload = self._deepseek_payload(query, intent_data, specialist_result)
+
+            # the system prompt never changes, so the user prompt (query + intent + context) is the whole input
+            prompt = payload["messages"][1]["content"]
+            cached = self._cached_llm_response(prompt)
+            if cached is not None:
+                return cached
+
+            response = await self._post_completion(payload)
+
+            if response.status_code == 200:
+                result = response.json()
+                generated_response = result["choices"][0]["message"]["content"]
+                self._cache_llm_response(prompt, generated_response)
+                return generated_response
+            return None
 
         except Exception as e:
-            return self._generate_template_response(query, intent_data, specialist_result)
+            return None
+
+    async def _stream_deepseek_response(self, query: str, intent_data: Dict, specialist_result: Dict) -> AsyncIterator[str]:
+        payload = self._deepseek_payload(query, intent_data, specialist_result)
+        payload["stream"] = True
+
+        prompt = payload["messages"][1]["content"]
+        cached = self._cached_llm_response(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        async with self._get_client().stream("POST", "/chat/completions", content=orjson.dumps(payload)) as response:
+            # failures raise so stream() can tell them apart from an answer and fall back
+            if response.status_code != 200:
+                raise RuntimeError(f"Deepseek returned {response.status_code}")
+
+            # server sent events, one "data: {chunk json}" line per delta and "data: [DONE]" at the end
+            chunks = []
+            async for line in response.aiter_lines():
+                if not line.startswith(SSE_DATA_PREFIX):
+                    continue
+                data = line[len(SSE_DATA_PREFIX):]
+                if data == SSE_DONE:
+                    # only a completed answer goes in the cache
+                    self._cache_llm_response(prompt, "".join(chunks))
+                    break
+                content = orjson.loads(data)["choices"][0]["delta"].get("content")
+                if content:
+                    chunks.append(content)
+                    yield content
+            else:
+                # connection closed without [DONE], what went out is only part of the answer
+                raise RuntimeError("Deepseek stream ended before [DONE]")
 
     def _generate_template_response(self, query: str, intent_data: Dict, specialist_result: Dict) -> str:
         intent = intent_data.get("intent", "general")
@@ -154,7 +362,7 @@ class ResponseAgent(BaseAgent):
         elif intent == "product_search" and parts:
             return f"I found {len(parts)} parts matching your search. Here are the top results with pricing and availability information."
 
-        elif intent in ["cart_operations", "purchase_intent", "pricing_inquiry", "checkout_assistance"]:
+        elif intent in TRANSACTION_TEMPLATE_INTENTS:
             transaction_type = specialist_result.get("transaction_type", "")
             message = specialist_result.get("message", "")
 
@@ -180,21 +388,19 @@ class ResponseAgent(BaseAgent):
         # intent info fr
         context_parts.append(f"User intent: {intent_data.get('intent', 'unknown')}")
 
-        parts = specialist_result.get("parts", [])
-
-        if not parts and "part" in specialist_result:
-            parts = [specialist_result["part"]]
+        parts = specialist_result.get("parts", [])  # singular "part" already folded in by _unpack_context
 
         if parts:
             context_parts.append(f"Found {len(parts)} relevant parts:")
             for i, part in enumerate(parts[:2]):  # top 2 only 
+                tools_required = part.get('tools_required')
                 part_info = [
                     f"Part {i+1}: {part['name']} (#{part['partselect_number']}) - ${part['price']}",
                     f"  Brand: {part.get('brand', 'N/A')}",
                     f"  Description: {part.get('description', 'No description available')}",
                     f"  Installation Difficulty: {part.get('installation_difficulty', 'Unknown')}",
-                    f"  Tools Required: {', '.join(part.get('tools_required', [])) if part.get('tools_required') else 'None'}",
-                    f"  Model Compatibility: {', '.join(part.get('model_compatibility', []))[:100]}...",
+                    f"  Tools Required: {', '.join(tools_required) if tools_required else 'None'}",
+                    f"  Model Compatibility: {', '.join(part.get('model_compatibility', [])[:MODEL_PREVIEW_COUNT])[:MODEL_PREVIEW_CHARS]}...",
                     f"  In Stock: {'Yes' if part.get('in_stock', False) else 'No'}"
                 ]
                 context_parts.extend(part_info)
@@ -239,25 +445,18 @@ class ResponseAgent(BaseAgent):
         return "\n".join(context_parts) if context_parts else "No specific context available"
 
     def _filter_parts_for_response(self, parts: List[Dict], intent: str, response_text: str) -> List[Dict]:
+        # specific part lookups, purchase intents, installation help etc never get here, see PASSTHROUGH_INTENTS
         if not parts:
             return parts
 
-        # for em specific part lookups, purchase intents, or installation help, return all parts
-        if intent in ["part_lookup", "purchase_intent", "installation_help", "compatibility_check"]:
-            return parts
-
         # for the search queries, try to extract part numbers mentioned in response
-        import re
-        mentioned_part_numbers = re.findall(r'#(PS\d+)', response_text)
+        mentioned_part_numbers = set(MENTIONED_PART_PATTERN.findall(response_text))
 
         if mentioned_part_numbers:
-            # return only parts mentioned in the response
-            filtered_parts = []
-            for part in parts:
-                if part.get('partselect_number') in mentioned_part_numbers:
-                    filtered_parts.append(part)
+            # return only parts mentioned in the response, set lookups so it's one pass over parts
+            filtered_parts = [part for part in parts if part.get('partselect_number') in mentioned_part_numbers]
 
-            # return found matches in the order mentioned
+            # found matches keep their relevance order from the search
             if filtered_parts:
                 return filtered_parts
 
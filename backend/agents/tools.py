@@ -1,13 +1,101 @@
+import functools
 import json
 import re
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from .vector_search_tool import VectorSearchTool
 
+TOOL_CACHE_SIZE = 1024
+
+def _is_tool_error(result) -> bool:
+    # single-result tools fail with {"error": ...}, list tools with [{"error": ...}]
+    if isinstance(result, list):
+        return len(result) == 1 and isinstance(result[0], dict) and "error" in result[0]
+    return isinstance(result, dict) and "error" in result
+
+def memoized_tool(func):
+    """LRU memo for an async tool method keyed on its arguments, parts data doesn't change after load"""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        cache = self._tool_cache.setdefault(func.__name__, OrderedDict())
+        key = (args, tuple(sorted(kwargs.items())))
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        result = await func(self, *args, **kwargs)
+
+        # failures aren't cached so a transient error doesn't stick
+        if not _is_tool_error(result):
+            cache[key] = result
+            if len(cache) > TOOL_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
+    return wrapper
+
+def _lowered(part: Dict, field: str) -> Optional[str]:
+    value = part.get(field)
+    return value.lower() if isinstance(value, str) else None
+
 class PartSelectTools:
 
     def __init__(self, parts_data: List[Dict]):
         self.parts_data = parts_data
         self.vector_search = VectorSearchTool(parts_data)
+        self._tool_cache = {}  # tool name -> LRU of results, see memoized_tool
+
+        # lowercased searchable/partselect/manufacturer number -> part, first part wins like the old scan
+        self._parts_by_number = {}
+        for part in parts_data:
+            numbers = part.get("searchable_numbers", []) + [
+                part.get("partselect_number", ""),
+                part.get("manufacturer_part_number", "")
+            ]
+            for number in numbers:
+                self._parts_by_number.setdefault(number.lower(), part)
+
+        # lowercased category -> its parts in catalog order, so category lookups don't walk every part
+        self._parts_by_category = {}
+        for part in parts_data:
+            category = part.get("category")
+            if category:
+                self._parts_by_category.setdefault(category.lower(), []).append(part)
+
+        # lowercased copies of everything keyword search compares, made once here instead of on every
+        # part for every query. kept beside the parts so search results are still the catalog dicts
+        self._search_rows = [
+            (
+                part,
+                _lowered(part, "partselect_number"),
+                _lowered(part, "manufacturer_part_number"),
+                _lowered(part, "category"),
+                _lowered(part, "appliance_type"),
+                _lowered(part, "brand"),
+                _lowered(part, "name"),
+                tuple(symptom.lower() for symptom in part.get("troubleshooting", {}).get("symptoms_fixed", []))
+            )
+            for part in parts_data
+        ]
+        # the same rows per lowercased category, a category filtered search only has to walk its own
+        self._search_rows_by_category = {}
+        for row in self._search_rows:
+            row_category = row[3]
+            if row_category is not None:
+                self._search_rows_by_category.setdefault(row_category, []).append(row)
+
+        # same for troubleshooting: the fixed symptoms as (original, lowercased) pairs since the originals
+        # get reported back, and every fixed symptom + common issue lowercased for the match itself
+        self._troubleshooting_rows = []
+        for part in parts_data:
+            troubleshooting = part.get("troubleshooting", {})
+            fixed = tuple((symptom, symptom.lower()) for symptom in troubleshooting.get("symptoms_fixed", []))
+            issues = tuple(issue.lower() for issue in troubleshooting.get("common_issues", []))
+            self._troubleshooting_rows.append((
+                part,
+                _lowered(part, "appliance_type"),
+                fixed,
+                tuple(symptom_lower for _, symptom_lower in fixed) + issues
+            ))
 
     async def search_parts(self, query: str, category: str = None,
                           appliance_type: str = None, brand: str = None, limit: int = 10) -> List[Dict]:
@@ -39,73 +127,82 @@ class PartSelectTools:
                                  appliance_type: str = None, brand: str = None, limit: int = 10) -> List[Dict]:
         results = []
         query_lower = query.lower()
+        query_words = query_lower.split()
+        # filters are the same for every part, lowercase them once
+        category_lower = category.lower() if category else None
+        appliance_lower = appliance_type.lower() if appliance_type else None
+        brand_lower = brand.lower() if brand else None
 
-        for part in self.parts_data:
+        # when category is specified only its parts can match, so that's all we walk
+        rows = self._search_rows_by_category.get(category_lower, []) if category else self._search_rows
+
+        for (part, partselect_number, manufacturer_number, part_category, part_appliance,
+             part_brand, name, symptoms) in rows:
             # mandatory check appliance type filter
-            if appliance_type and part["appliance_type"].lower() != appliance_type.lower():
+            if appliance_type and part_appliance != appliance_lower:
                 continue  # skip parts that don't match the appliance type
 
-            # when category is specified filter by it
-            if category and part["category"].lower() != category.lower():
-                continue  # skippy skip again
-
             # when brand is specified yktv
-            if brand and part["brand"].lower() != brand.lower():
+            if brand and part_brand != brand_lower:
                 continue  
 
             score = 0.0
 
             # part number match (highest priority)
-            if (part["partselect_number"].lower() in query_lower or
-                part["manufacturer_part_number"].lower() in query_lower):
+            if partselect_number in query_lower or manufacturer_number in query_lower:
                 score = 1.0
 
-            elif category and part["category"].lower() == category.lower():
+            # anything still here already matched the category / appliance filter
+            elif category:
                 score = 0.9
 
-            elif appliance_type and part["appliance_type"].lower() == appliance_type.lower():
+            elif appliance_type:
                 score = 0.8
 
-            elif any(word in part["name"].lower() for word in query_lower.split()):
+            elif any(word in name for word in query_words):
                 score = 0.7
 
-            elif any(word in part["brand"].lower() for word in query_lower.split()):
+            elif any(word in part_brand for word in query_words):
                 score = 0.6
 
-            symptoms = part.get("troubleshooting", {}).get("symptoms_fixed", [])
-            if any(symptom.lower() in query_lower for symptom in symptoms):
+            # a symptom match sets 0.8, pointless to look when that's the score already
+            if score != 0.8 and any(symptom in query_lower for symptom in symptoms):
                 score = 0.8
 
             if score > 0:
-                part_copy = part.copy()
-                part_copy["relevance_score"] = score
-                results.append(part_copy)
+                results.append({**part, "relevance_score": score})
 
         # sortibg by relevance and return top results
         results.sort(key=lambda x: x["relevance_score"], reverse=True)
         return results[:limit]
 
+    def _find_part(self, part_number: str) -> Optional[Dict]:
+        # plain index lookup for the tools in here, no coroutine or memo bookkeeping around an O(1) get
+        return self._parts_by_number.get(part_number.lower().strip())
+
+    @memoized_tool
     async def get_part_details(self, part_number: str) -> Optional[Dict]:
         try:
-            search_term = part_number.lower().strip()
-
-            for i, part in enumerate(self.parts_data):
-                searchable_numbers = part.get("searchable_numbers", [])
-                if any(num.lower() == search_term for num in searchable_numbers):
-                    return part
-
-                if (part["partselect_number"].lower() == search_term or
-                    part["manufacturer_part_number"].lower() == search_term):
-                    return part
-            return None
+            return self._find_part(part_number)
         except Exception as e:
             return {"error": f"Failed to get part details: {str(e)}"}
 
+    async def get_parts_details_bulk(self, part_numbers: List[str]) -> Dict[str, Dict]:
+        """part number -> part for every number in the catalog, input order, unknown numbers left out.
+        one call for a whole batch instead of a get_part_details coroutine per number"""
+        parts = {}
+        for part_number in part_numbers:
+            part = self._find_part(part_number)
+            if part:
+                parts[part_number] = part
+        return parts
+
+    @memoized_tool
     async def check_compatibility(self, part_number: str, model_number: str) -> Dict[str, Any]:
         """Check if a part is compatible with a specific model"""
         try:
-            part = await self.get_part_details(part_number)
-            if not part or "error" in part:
+            part = self._find_part(part_number)
+            if not part:
                 return {
                     "compatible": False,
                     "reason": "Part not found",
@@ -134,10 +231,11 @@ class PartSelectTools:
         except Exception as e:
             return {"error": f"Compatibility check failed: {str(e)}"}
 
+    @memoized_tool
     async def get_installation_guide(self, part_number: str) -> Dict[str, Any]:
         try:
-            part = await self.get_part_details(part_number)
-            if not part or "error" in part:
+            part = self._find_part(part_number)
+            if not part:
                 return {"error": "Part not found"}
 
             installation = part.get("installation", {})
@@ -158,26 +256,25 @@ class PartSelectTools:
     async def troubleshoot_issue(self, symptoms: str, appliance_type: str = None) -> List[Dict]:
         try:
             symptoms_lower = symptoms.lower()
+            appliance_lower = appliance_type.lower() if appliance_type else None
             potential_parts = []
 
-            for part in self.parts_data:
+            for part, part_appliance, fixed, known_symptoms in self._troubleshooting_rows:
    
-                if appliance_type and part["appliance_type"].lower() != appliance_type.lower():
+                if appliance_type and part_appliance != appliance_lower:
                     continue
 
-                part_symptoms = part.get("troubleshooting", {}).get("symptoms_fixed", [])
-                common_issues = part.get("troubleshooting", {}).get("common_issues", [])
-
                 symptom_match = any(
-                    symptom.lower() in symptoms_lower or symptoms_lower in symptom.lower()
-                    for symptom in part_symptoms + common_issues
+                    symptom in symptoms_lower or symptoms_lower in symptom
+                    for symptom in known_symptoms
                 )
 
                 if symptom_match:
+                    symptoms_addressed = [symptom for symptom, symptom_lower in fixed if symptom_lower in symptoms_lower]
                     potential_parts.append({
                         "part": part,
-                        "symptoms_addressed": [s for s in part_symptoms if s.lower() in symptoms_lower],
-                        "confidence": 0.8 if len([s for s in part_symptoms if s.lower() in symptoms_lower]) > 1 else 0.6
+                        "symptoms_addressed": symptoms_addressed,
+                        "confidence": 0.8 if len(symptoms_addressed) > 1 else 0.6
                     })
 
             potential_parts.sort(key=lambda x: x["confidence"], reverse=True)
@@ -188,8 +285,8 @@ class PartSelectTools:
 
     async def get_ordering_info(self, part_number: str) -> Dict[str, Any]:
         try:
-            part = await self.get_part_details(part_number)
-            if not part or "error" in part:
+            part = self._find_part(part_number)
+            if not part:
                 return {"error": "Part not found"}
 
             ordering = part.get("ordering", {})
@@ -209,15 +306,15 @@ class PartSelectTools:
 
     async def find_alternative_parts(self, part_number: str) -> List[Dict]:
         try:
-            original_part = await self.get_part_details(part_number)
-            if not original_part or "error" in original_part:
+            original_part = self._find_part(part_number)
+            if not original_part:
                 return []
 
             alternatives = []
             original_category = original_part.get("category", "")
             original_appliance = original_part.get("appliance_type", "")
 
-            for part in self.parts_data:
+            for part in self._parts_by_category.get(original_category.lower(), []):
                 # skip the original part
                 if part["partselect_number"] == part_number:
                     continue
@@ -243,13 +340,13 @@ class PartSelectTools:
         except Exception as e:
             return [{"error": f"Failed to find alternatives: {str(e)}"}]
 
+    @memoized_tool
     async def get_parts_by_category(self, category: str, appliance_type: str = None, limit: int = 10) -> List[Dict]:
         try:
             results = []
-            for part in self.parts_data:
-                if part["category"].lower() == category.lower():
-                    if not appliance_type or part["appliance_type"].lower() == appliance_type.lower():
-                        results.append(part)
+            for part in self._parts_by_category.get(category.lower(), []):
+                if not appliance_type or part["appliance_type"].lower() == appliance_type.lower():
+                    results.append(part)
 
             return results[:limit]
 
@@ -272,8 +369,8 @@ class PartSelectTools:
     async def find_similar_parts(self, part_number: str, top_k: int = 3) -> List[Dict]:
         if not self.vector_search.is_available():
             # Fallback to category-based similarity
-            part = await self.get_part_details(part_number)
-            if part and "error" not in part:
+            part = self._find_part(part_number)
+            if part:
                 return await self.get_parts_by_category(
                     part.get("category", ""),
                     part.get("appliance_type", ""),
@@ -1,9 +1,14 @@
 # Handles purchase assistance, cart operations, and checkout flow
 
 import os
+import re
 from typing import Dict, Any, List
 from .base_agent import BaseAgent, AgentResult
 
+CONFIRMATION_PHRASES = ("yes", "add it", "yes add", "proceed")
+PURCHASE_KEYWORDS = ("add", "buy", "purchase", "order", "want to buy", "want to purchase", "want to order")
+PART_NUMBER_RE = re.compile(r'[A-Z]{2}\d{8,}')
+
 class TransactionAgent(BaseAgent):
 
     def __init__(self):
@@ -131,9 +136,9 @@ class TransactionAgent(BaseAgent):
             )
 
     async def _handle_cart_operations(self, query: str, context: Dict) -> AgentResult:
+        query_lower = query.lower()
 
-        confirmation_phrases = ["yes", "add it", "yes add", "proceed"]
-        if any(phrase in query.lower() for phrase in confirmation_phrases):
+        if any(phrase in query_lower for phrase in CONFIRMATION_PHRASES):
             last_part = context.get("last_shown_part")
             if last_part:
                 part_number = last_part.get("partselect_number")
@@ -173,12 +178,10 @@ class TransactionAgent(BaseAgent):
                 )
 
         # if user is asking to add/buy/purchase a specific type of part
-        purchase_keywords = ["add", "buy", "purchase", "order", "want to buy", "want to purchase", "want to order"]
-        if any(keyword in query.lower() for keyword in purchase_keywords):
+        if any(keyword in query_lower for keyword in PURCHASE_KEYWORDS):
 
             # part numbers from the query
-            import re
-            part_numbers = re.findall(r'[A-Z]{2}\d{8,}', query.upper())
+            part_numbers = PART_NUMBER_RE.findall(query.upper())
 
             if part_numbers:
                 # specific part number purchase
@@ -198,7 +201,7 @@ class TransactionAgent(BaseAgent):
                     },
                     message=f"Processing purchase request for part {part_number}"
                 )
-            elif "ice" in query.lower() or "icemaker" in query.lower():
+            elif "ice" in query_lower or "icemaker" in query_lower:
                 return AgentResult(
                     success=True,
                     data={
@@ -213,7 +216,7 @@ class TransactionAgent(BaseAgent):
                     },
                     message="Redirecting to show available ice maker parts"
                 )
-            elif "refrigerator" in query.lower() or "fridge" in query.lower():
+            elif "refrigerator" in query_lower or "fridge" in query_lower:
                 return AgentResult(
                     success=True,
                     data={
@@ -228,7 +231,7 @@ class TransactionAgent(BaseAgent):
                     },
                     message="Redirecting to show available refrigerator parts"
                 )
-            elif "dishwasher" in query.lower():
+            elif "dishwasher" in query_lower:
                 return AgentResult(
                     success=True,
                     data={
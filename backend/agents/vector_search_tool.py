@@ -1,5 +1,6 @@
 # for semantic search capabilities using Pinecone + OpenAI embeddings
 
+import asyncio
 import os
 import json
 import hashlib
@@ -11,6 +12,11 @@ class VectorSearchTool:
 
     def __init__(self, parts_data: List[Dict]):
         self.parts_data = parts_data
+        # partselect number -> part, so mapping pinecone matches back is O(1)
+        # (setdefault keeps the first part like the old linear scan did)
+        self.parts_by_number = {}
+        for part in parts_data:
+            self.parts_by_number.setdefault(part["partselect_number"], part)
         self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.index_name = os.getenv("PINECONE_INDEX_NAME", "partselect-parts")
@@ -40,6 +46,10 @@ class VectorSearchTool:
         if not self.openai_client:
             return None
 
+        # the openai client is blocking, keep it off the event loop
+        return await asyncio.to_thread(self._embed, text)
+
+    def _embed(self, text: str) -> Optional[List[float]]:
         try:
             response = self.openai_client.embeddings.create(
                 model="text-embedding-3-small",
@@ -143,13 +153,10 @@ class VectorSearchTool:
             found_parts = []
             for match in results.matches:
                 part_number = match.id
-                full_part = next((p for p in self.parts_data if p["partselect_number"] == part_number), None)
+                full_part = self.parts_by_number.get(part_number)
 
                 if full_part:
-                    part_with_score = full_part.copy()
-                    part_with_score["semantic_score"] = match.score
-                    part_with_score["search_type"] = "semantic"
-                    found_parts.append(part_with_score)
+                    found_parts.append({**full_part, "semantic_score": match.score, "search_type": "semantic"})
 
             return found_parts
 
@@ -168,9 +175,7 @@ class VectorSearchTool:
         for part in traditional_results:
             part_number = part["partselect_number"]
             if part_number not in seen_parts:
-                part_copy = part.copy()
-                part_copy["search_type"] = "traditional"
-                hybrid_results.append(part_copy)
+                hybrid_results.append({**part, "search_type": "traditional"})
                 seen_parts.add(part_number)
 
         for part in semantic_results:
@@ -186,7 +191,7 @@ class VectorSearchTool:
         if not self.is_available():
             return []
 
-        reference_part = next((p for p in self.parts_data if p["partselect_number"] == part_number), None)
+        reference_part = self.parts_by_number.get(part_number)
         if not reference_part:
             return []
 
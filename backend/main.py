@@ -1,13 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import json
+import logging
+import logging.handlers
 import os
+import queue
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv("../.env")
 
+# records are queued and written by a listener thread so a slow stdout never stalls the event loop
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[logging.handlers.QueueHandler(log_queue)])
+log_listener.start()
+logger = logging.getLogger(__name__)
+
 # modules
 from models import ChatRequest, ChatResponse, PartInfo, TransactionRequest, TransactionResponse, Cart
 from agents.agent_orchestrator import AgentOrchestrator
@@ -31,9 +43,16 @@ async def startup_event():
     try:
         agent_orchestrator = AgentOrchestrator()
         await agent_orchestrator.initialize()
-        print("Agent Orchestrator initialized successfully")
+        logger.info("Agent Orchestrator initialized successfully")
     except Exception as e:
-        print(f"Error initializing Agent Orchestrator: {e}")
+        logger.error("Error initializing Agent Orchestrator: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if agent_orchestrator:
+        await agent_orchestrator.close()
+    # flushes whatever is still queued
+    log_listener.stop()
 
 @app.get("/")
 async def root():
@@ -92,24 +111,43 @@ async def chat_endpoint(request: ChatRequest):
             conversation_history=request.conversation_history
         )
 
-        print(f"DEBUG: Result from orchestrator: {result}")
+        logger.debug("Result from orchestrator: %s", result)
 
-        parts = [PartInfo(**part) for part in result.get("parts", [])]
-
-        return ChatResponse(
-            message=result.get("message", "I couldn't process your request."),
-            parts=parts,
-            query_type=result.get("query_type", "unknown"),
-            confidence=result.get("confidence"),
-            suggested_actions=result.get("suggested_actions", [])
-        )
+        return _chat_response(result)
 
     except Exception as e:
-        print(f"Error processing chat: {e}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Error processing chat: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """same as /chat but as server sent events: "delta" events with text as the llm writes it,
+    then one "result" event carrying the full ChatResponse"""
+    if not agent_orchestrator:
+        raise HTTPException(status_code=500, detail="Agent orchestrator not initialized")
+
+    async def events():
+        async for event, payload in agent_orchestrator.process_query_stream(
+            query=request.message,
+            conversation_history=request.conversation_history
+        ):
+            if event == "result":
+                payload = _chat_response(payload).model_dump()
+            yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def _chat_response(result: dict) -> ChatResponse:
+    parts = [PartInfo(**part) for part in result.get("parts", [])]
+
+    return ChatResponse(
+        message=result.get("message", "I couldn't process your request."),
+        parts=parts,
+        query_type=result.get("query_type", "unknown"),
+        confidence=result.get("confidence"),
+        suggested_actions=result.get("suggested_actions", [])
+    )
+
 @app.get("/parts/search")
 async def search_parts(q: str, limit: int = 10):
     """Search parts endpoint"""
@@ -200,4 +238,5 @@ async def get_agent_status():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # "auto" picks uvloop when it's installed and falls back to the stock asyncio loop
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto")
\ No newline at end of file
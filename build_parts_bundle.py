@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# merges the per-appliance parts catalogs into one file so the backend parses a single json at startup
+
+
+import os
+import sys
+import orjson
+
+DATA_DIR = os.getenv("PARTS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+CATALOG_FILES = ["refrigerator_parts.json", "dishwasher_parts.json"]
+BUNDLE_FILE = "parts_bundle.json"
+
+def build_parts_bundle():
+
+    parts = []
+    for name in CATALOG_FILES:
+        path = os.path.join(DATA_DIR, name)
+        if not os.path.exists(path):
+            print(f" Skipping {name} (not found)")
+            continue
+
+        with open(path, 'rb') as f:
+            catalog_parts = orjson.loads(f.read()).get('parts', [])
+        parts.extend(catalog_parts)
+        print(f" {name}: {len(catalog_parts)} parts")
+
+    if not parts:
+        print("Error: no parts found in any catalog")
+        return False
+
+    bundle_path = os.path.join(DATA_DIR, BUNDLE_FILE)
+    tmp_path = bundle_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps({"total_parts": len(parts), "parts": parts}))
+    os.replace(tmp_path, bundle_path)
+
+    print(f" Wrote {len(parts)} parts to {bundle_path}")
+    return True
+
+if __name__ == "__main__":
+    print(" PartSelect Parts Bundle")
+    print("=" * 40)
+
+    if not build_parts_bundle():
+        sys.exit(1)